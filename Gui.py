@@ -1,11 +1,17 @@
 import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QFileDialog, QLabel, QVBoxLayout, QWidget, QHBoxLayout, QSlider, QSizePolicy, QMessageBox, QStackedWidget, QSpacerItem, QSizePolicy
+import time
+
+# Zamanlama, ağır kütüphaneler yüklenmeden önce başlar
+startup_start_time = time.perf_counter()
+
+from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QFileDialog, QLabel, QVBoxLayout, QWidget, QHBoxLayout, QSlider, QSizePolicy, QMessageBox, QStackedWidget, QSpacerItem, QSizePolicy, QSpinBox
 from PyQt5.QtGui import QFont, QIcon, QImage, QPixmap
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal
-import cv2
-from ultralytics import YOLO
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
 import os
-import time
+
+# cv2 and ultralytics (torch) are imported in the background after the window is shown
+cv2 = None
+YOLO = None
 
 class ClickableLabel(QLabel):
     clicked = pyqtSignal()
@@ -13,6 +19,159 @@ class ClickableLabel(QLabel):
     def mousePressEvent(self, event):
         self.clicked.emit()
 
+class HeavyImportThread(QThread):
+    progress = pyqtSignal(str)
+    imported = pyqtSignal(object, object, float)
+    failed = pyqtSignal(str)
+
+    def run(self):
+        try:
+            import_start = time.perf_counter()
+            self.progress.emit("Loading OpenCV...")
+            import cv2 as cv2_module
+            self.progress.emit("Loading YOLO (PyTorch)...")
+            from ultralytics import YOLO as yolo_class
+            self.imported.emit(cv2_module, yolo_class, time.perf_counter() - import_start)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+class ModelLoadThread(QThread):
+    loaded = pyqtSignal(object, float)
+    failed = pyqtSignal(str)
+
+    def __init__(self, modelFileName):
+        super().__init__()
+        self.modelFileName = modelFileName
+
+    def run(self):
+        try:
+            load_start = time.perf_counter()
+            model = YOLO(self.modelFileName)
+            self.loaded.emit(model, time.perf_counter() - load_start)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+class QualityController:
+    # (inference input size, frame stride, display scale), highest quality first.
+    # Level 0 runs at the model's own input size.
+    LEVELS = [
+        (None, 1, 1.0),
+        (512, 1, 1.0),
+        (480, 1, 0.75),
+        (416, 2, 0.75),
+        (320, 2, 0.5),
+        (256, 3, 0.5),
+    ]
+
+    def __init__(self, target_fps=33):
+        self.level = 0
+        self.base_imgsz = 640
+        self.set_target_fps(target_fps)
+        self.reset()
+
+    def set_target_fps(self, target_fps):
+        self.target_fps = target_fps
+        self.budget_ms = 1000.0 / target_fps
+        self.step_up_delay = 60
+        self.reset_counters()
+
+    def set_base_imgsz(self, imgsz):
+        if isinstance(imgsz, (list, tuple)):
+            imgsz = max(imgsz)
+        self.base_imgsz = int(imgsz)
+
+    def reset(self):
+        self.stage_ms = {"capture": 0.0, "inference": 0.0, "display": 0.0}
+        self.step_up_delay = 60
+        self.frames_since_step_up = None
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.inference_ms = None
+        self.display_ms = None
+        self.slow_frames = 0
+        self.fast_frames = 0
+        self.cooldown = 30
+
+    def level_imgsz(self, level):
+        size = self.LEVELS[level][0]
+        if size is None:
+            return self.base_imgsz
+        return min(size, self.base_imgsz)
+
+    @property
+    def imgsz(self):
+        return self.level_imgsz(self.level)
+
+    @property
+    def stride(self):
+        return self.LEVELS[self.level][1]
+
+    @property
+    def display_scale(self):
+        return self.LEVELS[self.level][2]
+
+    @property
+    def frame_ms(self):
+        if self.inference_ms is None:
+            return None
+        return self.inference_ms + self.display_ms
+
+    def describe(self):
+        return f"Size: {self.imgsz}  Stride: {self.stride}  Display: {int(self.display_scale * 100)}%"
+
+    def estimate_frame_ms(self, level):
+        # Çıkarım maliyeti imgsz² ile, ekran maliyeti ölçek² ile orantılı kabul edilir
+        _, stride, scale = self.LEVELS[level]
+        inference = self.inference_ms * (self.level_imgsz(level) / self.imgsz) ** 2 * (self.stride / stride)
+        display = self.display_ms * (scale / self.display_scale) ** 2
+        return inference + display
+
+    def update(self, stage_times):
+        # Aşama sürelerinin üstel hareketli ortalaması (ms)
+        for stage, ms in stage_times.items():
+            self.stage_ms[stage] = 0.8 * self.stage_ms[stage] + 0.2 * ms
+        if self.frames_since_step_up is not None:
+            self.frames_since_step_up += 1
+
+        # Kamera bekleme süresi ayarlarla azaltılamaz, bütçeye dahil edilmez
+        if self.inference_ms is None:
+            self.inference_ms = stage_times["inference"]
+            self.display_ms = stage_times["display"]
+        else:
+            self.inference_ms = 0.9 * self.inference_ms + 0.1 * stage_times["inference"]
+            self.display_ms = 0.9 * self.display_ms + 0.1 * stage_times["display"]
+
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return False
+
+        # Hysteresis: drop quality quickly when over budget, raise it only after a long stretch
+        # in which the estimated cost of the next level also fits the budget
+        if self.frame_ms > self.budget_ms * 1.1:
+            self.slow_frames += 1
+            self.fast_frames = 0
+        elif self.level > 0 and self.estimate_frame_ms(self.level - 1) < self.budget_ms * 0.9:
+            self.fast_frames += 1
+            self.slow_frames = 0
+        else:
+            self.slow_frames = 0
+            self.fast_frames = 0
+
+        if self.slow_frames >= 10 and self.level < len(self.LEVELS) - 1:
+            self.level += 1
+            # A step up that did not hold makes the next one wait twice as long
+            if self.frames_since_step_up is not None and self.frames_since_step_up < 300:
+                self.step_up_delay = min(self.step_up_delay * 2, 1920)
+            self.frames_since_step_up = None
+        elif self.fast_frames >= self.step_up_delay and self.level > 0:
+            self.level -= 1
+            self.frames_since_step_up = 0
+        else:
+            return False
+        self.reset_counters()
+        return True
+
 class VideoProcessingApp(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -38,12 +197,24 @@ class VideoProcessingApp(QMainWindow):
         self.camera_timer = QTimer()
         self.camera_timer.timeout.connect(self.update_camera_frame)
 
+        # Arka planda yükleme durumu
+        self.libraries_loaded = False
+        self.pending_video = None
+        self.pending_model = None
+        self.import_thread = None
+        self.model_thread = None
+        self.first_paint_time = None
+
         self.initUI()
 
         # FPS hesaplama için değişkenler
         self.start_time = None
         self.frame_counter = 0
 
+        # Kamera sayfası için uyarlamalı kalite
+        self.quality_controller = QualityController(self.target_fps_spinbox.value())
+        self.last_camera_results = None
+
     def initUI(self):
         # Stacked Widget to switch between pages
         self.stacked_widget = QStackedWidget()
@@ -120,6 +291,11 @@ class VideoProcessingApp(QMainWindow):
         self.model_path_label.setAlignment(Qt.AlignCenter)
         self.model_path_label.setStyleSheet("color: #333333; margin-bottom: 20px;")
 
+        self.status_label = QLabel("Loading libraries...", self.first_page)
+        self.status_label.setFont(QFont("Arial", 10))
+        self.status_label.setAlignment(Qt.AlignCenter)
+        self.status_label.setStyleSheet("color: #808080; margin-bottom: 10px;")
+
         self.proceed_button = QPushButton("Go to Processing Page", self.first_page)
         self.proceed_button.setFont(QFont("Arial", 12, QFont.Bold))
         self.proceed_button.setStyleSheet("""
@@ -179,6 +355,7 @@ class VideoProcessingApp(QMainWindow):
         button_layout.addWidget(self.model_path_label)
         button_layout.addWidget(self.proceed_button)
         button_layout.addWidget(self.camera_button)
+        button_layout.addWidget(self.status_label)
 
         main_layout = QVBoxLayout(self.first_page)
         main_layout.setAlignment(Qt.AlignCenter)
@@ -340,6 +517,21 @@ class VideoProcessingApp(QMainWindow):
         self.detection_results_camera.setStyleSheet("color: #333333; margin: 10px;")
         self.detection_results_camera.setFixedHeight(200)  # Adjust as needed
 
+        self.target_fps_label = QLabel("Target FPS:", self.third_page)
+        self.target_fps_label.setFont(QFont("Arial", 10))
+        self.target_fps_label.setStyleSheet("color: #333333;")
+
+        self.target_fps_spinbox = QSpinBox(self.third_page)
+        self.target_fps_spinbox.setFont(QFont("Arial", 10))
+        self.target_fps_spinbox.setRange(1, 60)
+        self.target_fps_spinbox.setValue(33)
+        self.target_fps_spinbox.valueChanged.connect(self.set_target_fps)
+
+        self.camera_timing_label = QLabel(self.third_page)
+        self.camera_timing_label.setFont(QFont("Arial", 10))
+        self.camera_timing_label.setWordWrap(True)
+        self.camera_timing_label.setStyleSheet("color: #333333; margin: 10px;")
+
         self.camera_start_button = QPushButton("Start", self.third_page)
         self.camera_start_button.setFont(QFont("Arial", 12, QFont.Bold))
         self.camera_start_button.setStyleSheet("""
@@ -409,8 +601,14 @@ class VideoProcessingApp(QMainWindow):
         button_layout.addWidget(self.camera_stop_button)
         button_layout.addWidget(self.camera_back_button)
 
+        target_fps_layout = QHBoxLayout()
+        target_fps_layout.addWidget(self.target_fps_label)
+        target_fps_layout.addWidget(self.target_fps_spinbox)
+
         side_layout = QVBoxLayout()
         side_layout.addLayout(detection_layout)
+        side_layout.addLayout(target_fps_layout)
+        side_layout.addWidget(self.camera_timing_label)
         side_layout.addLayout(button_layout)
 
         main_layout = QHBoxLayout(self.third_page)
@@ -418,6 +616,53 @@ class VideoProcessingApp(QMainWindow):
         main_layout.addLayout(side_layout, 1)
         main_layout.setContentsMargins(20, 20, 20, 20)
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.first_paint_time is None:
+            self.first_paint_time = time.perf_counter()
+            # Start the heavy imports once the first paint has been processed
+            QTimer.singleShot(0, self.on_first_window_shown)
+
+    def on_first_window_shown(self):
+        print(f"Startup: time to first window {self.first_paint_time - startup_start_time:.3f} s")
+        self.import_thread = HeavyImportThread()
+        self.import_thread.progress.connect(self.status_label.setText)
+        self.import_thread.imported.connect(self.on_libraries_imported)
+        self.import_thread.failed.connect(self.on_libraries_failed)
+        self.import_thread.start()
+
+    def on_libraries_imported(self, cv2_module, yolo_class, import_time):
+        global cv2, YOLO
+        cv2 = cv2_module
+        YOLO = yolo_class
+        self.libraries_loaded = True
+        print(f"Startup: libraries imported in {import_time:.3f} s "
+              f"(ready {time.perf_counter() - startup_start_time:.3f} s after launch)")
+        self.status_label.setText("Libraries loaded.")
+
+        # Seçimler kütüphaneler yüklenirken yapıldıysa şimdi işle
+        if self.pending_video:
+            self.load_video(self.pending_video)
+        if self.pending_model:
+            self.load_model(self.pending_model)
+
+    def on_libraries_failed(self, error):
+        self.status_label.setText("Library loading failed.")
+        # Kütüphaneler olmadan video ve model açılamaz
+        self.pending_video = None
+        self.pending_model = None
+        self.video_button.setEnabled(False)
+        self.model_button.setEnabled(False)
+        QMessageBox.critical(self, "Library Loading Error", f"An error occurred while loading libraries: {error}")
+
+    def closeEvent(self, event):
+        # Arka plan iş parçacıkları bitmeden QThread nesneleri silinmemeli
+        for thread in (self.import_thread, self.model_thread):
+            if thread is not None and thread.isRunning():
+                thread.blockSignals(True)
+                thread.wait()
+        super().closeEvent(event)
+
     def openFileNameDialog(self):
         options = QFileDialog.Options()
         options |= QFileDialog.ReadOnly
@@ -435,14 +680,48 @@ class VideoProcessingApp(QMainWindow):
             self.load_model(modelFileName)
 
     def load_model(self, modelFileName):
-        try:
-            self.model = YOLO(modelFileName)
-            self.model_loaded = True
-            self.check_ready_to_proceed()
-        except Exception as e:
-            QMessageBox.critical(self, "Model Loading Error", f"An error occurred while loading the model: {str(e)}")
+        if not self.libraries_loaded:
+            self.pending_model = modelFileName
+            self.status_label.setText("Model will be loaded once libraries are ready...")
+            return
+        self.pending_model = None
+        if self.model_thread is not None and self.model_thread.isRunning():
+            self.pending_model = modelFileName
+            return
+        # Keep the previous model usable until the new one has loaded
+        self.model_button.setEnabled(False)
+        self.status_label.setText("Loading model...")
+        self.model_thread = ModelLoadThread(modelFileName)
+        self.model_thread.loaded.connect(self.on_model_loaded)
+        self.model_thread.failed.connect(self.on_model_failed)
+        self.model_thread.finished.connect(self.on_model_thread_finished)
+        self.model_thread.start()
+
+    def on_model_loaded(self, model, load_time):
+        self.model = model
+        self.model_loaded = True
+        # En yüksek kalite seviyesi modelin kendi giriş boyutunu kullanır
+        self.quality_controller.set_base_imgsz(model.overrides.get("imgsz", 640))
+        print(f"Startup: model loaded in {load_time:.3f} s")
+        self.status_label.setText("Model loaded.")
+        self.check_ready_to_proceed()
+
+    def on_model_failed(self, error):
+        self.status_label.setText("Model loading failed.")
+        QMessageBox.critical(self, "Model Loading Error", f"An error occurred while loading the model: {error}")
+
+    def on_model_thread_finished(self):
+        self.model_button.setEnabled(True)
+        # Yükleme sırasında başka bir model seçildiyse onu yükle
+        if self.pending_model:
+            self.load_model(self.pending_model)
 
     def load_video(self, fileName):
+        if not self.libraries_loaded:
+            self.pending_video = fileName
+            self.status_label.setText("Video will be opened once libraries are ready...")
+            return
+        self.pending_video = None
         self.cap = cv2.VideoCapture(fileName)
         if not self.cap.isOpened():
             QMessageBox.critical(self, "Video Loading Error", "Unable to load video. Please select a valid video file.")
@@ -629,10 +908,18 @@ class VideoProcessingApp(QMainWindow):
         self.camera_stop_button.setEnabled(True)
         self.start_time = time.time()  # FPS hesaplaması için başlangıç zamanını belirleyin
         self.frame_counter = 0  # Frame sayacını sıfırlayın
-        self.camera_timer.start(30)
+        self.last_camera_results = None
+        self.quality_controller.reset()
+        self.camera_timer.start(int(1000 / self.quality_controller.target_fps))
+
+    def set_target_fps(self, target_fps):
+        self.quality_controller.set_target_fps(target_fps)
+        if self.camera_timer.isActive():
+            self.camera_timer.setInterval(int(1000 / target_fps))
 
     def update_camera_frame(self):
         if self.cap.isOpened():
+            capture_start = time.perf_counter()
             ret, frame = self.cap.read()
             if ret:
                 self.frame_counter += 1
@@ -642,22 +929,57 @@ class VideoProcessingApp(QMainWindow):
                 else:
                     fps = 0.0
 
-                results = self.model(frame)
-                processed_frame = self.process_frame(frame, results)
+                controller = self.quality_controller
+                inference_start = time.perf_counter()
+                results = None
+                if self.last_camera_results is None or self.frame_counter % controller.stride == 0:
+                    results = self.model(frame, imgsz=controller.imgsz)
+                    self.last_camera_results = results
+                    processed_frame = self.process_frame(frame, results)
+                else:
+                    # Atlanan karelerde son tespitleri yeni kare üzerine çiz
+                    processed_frame = frame
+                    for result in self.last_camera_results:
+                        processed_frame = result.plot(img=frame.copy())
+                display_start = time.perf_counter()
 
-                # FPS metnini çerçeveye ekle
+                if controller.display_scale < 1.0:
+                    processed_frame = cv2.resize(processed_frame, None, fx=controller.display_scale, fy=controller.display_scale, interpolation=cv2.INTER_AREA)
+
+                # FPS metnini ve çalışma noktasını çerçeveye ekle
                 cv2.putText(processed_frame, f"FPS: {fps:.2f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
+                cv2.putText(processed_frame, controller.describe(), (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 1, cv2.LINE_AA)
 
                 # Convert from OpenCV BGR format to QImage RGB format
                 rgb_frame = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB)
-                image = QImage(rgb_frame, rgb_frame.shape[1], rgb_frame.shape[0], QImage.Format_RGB888)
+                image = QImage(rgb_frame, rgb_frame.shape[1], rgb_frame.shape[0], rgb_frame.strides[0], QImage.Format_RGB888)
 
                 # Scale to QLabel size
                 scaled_image = image.scaled(self.camera_view.size(), Qt.KeepAspectRatio)
                 self.camera_view.setPixmap(QPixmap.fromImage(scaled_image))
 
                 # Show detection results
-                self.print_camera_detection_results(results)
+                if results is not None:
+                    self.print_camera_detection_results(results)
+                display_end = time.perf_counter()
+
+                controller.update({
+                    "capture": (inference_start - capture_start) * 1000,
+                    "inference": (display_start - inference_start) * 1000,
+                    "display": (display_end - display_start) * 1000,
+                })
+                self.update_camera_timing_info()
+
+    def update_camera_timing_info(self):
+        controller = self.quality_controller
+        stage_ms = controller.stage_ms
+        self.camera_timing_label.setText(
+            f"Budget: {controller.budget_ms:.1f} ms\n"
+            f"Capture: {stage_ms['capture']:.1f} ms\n"
+            f"Inference: {stage_ms['inference']:.1f} ms\n"
+            f"Display: {stage_ms['display']:.1f} ms\n"
+            f"{controller.describe()}"
+        )
 
     def stop_camera(self):
         self.camera_timer.stop()